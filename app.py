@@ -1,23 +1,71 @@
 import datetime
 import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from flask import Flask, render_template, send_file
-from docx import Document
+from flask.cli import load_dotenv
+from flask.helpers import get_debug_flag
+from xml.sax.saxutils import escape
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional; stdlib json reads the same bytes
+    from json import loads as json_loads
 
 app = Flask(__name__)
 
+# --- HTTP SESSION ---
+# One keep-alive session for the whole process so repeat calls to the NGX API
+# reuse the same TCP/TLS connection instead of handshaking every time.
+# Brief connection drops and 5xx blips are retried on that same connection pool.
+SESSION = requests.Session()
+SESSION.headers.update({
+    "User-Agent": "Mozilla/5.0",
+    "Referer": "https://ngxgroup.com/"
+})
+# Retry failed connects and one 502/503/504, but never a read timeout (a hung
+# server stays hung) and never sleep for a server-sent Retry-After.
+RETRY = Retry(
+    total=2, read=0, status=1, backoff_factor=0.3,
+    status_forcelist=(502, 503, 504), allowed_methods=["GET"],
+    respect_retry_after_header=False
+)
+# (connect, read): give up quickly on an unreachable host; the JSON is a few KB.
+# Worst case per endpoint is ~20s: one failed connect (3.05s), one slow 5xx
+# (3.05s + 5s), a 0.6s backoff, then a final attempt that hangs (3.05s + 5s).
+REQUEST_TIMEOUT = (3.05, 5)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=RETRY))
+
+# Shared worker pool so the gainers and losers calls run side by side
+EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
 # --- DATA FETCHING LOGIC ---
+# Last ETag / Last-Modified seen per endpoint, with the rows parsed from that
+# response, so a refresh can ask NGX for a cheap 304 when nothing has changed.
+_validators = {}
+
 def get_ngx_api_data(endpoint):
     """Fetches Top/Bottom symbols directly from NGX API"""
     url = f"https://doclib.ngxgroup.com/REST/api/mrkstat/{endpoint}"
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Referer": "https://ngxgroup.com/"
-    }
+    headers = {}
+    previous = _validators.get(endpoint)
+    if previous:
+        etag, last_modified, _ = previous
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        data = response.json()
+        response = SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and previous:
+            return previous[2]
+        data = json_loads(response.content)
         
         output = []
         for item in data[:5]:  # Get Top 5
@@ -36,34 +84,186 @@ def get_ngx_api_data(endpoint):
                 "raw_price": todays_close,
                 "raw_pct": pc_val
             })
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if output and (etag or last_modified):
+            _validators[endpoint] = (etag, last_modified, output)
         return output
     except Exception as e:
         print(f"API Error for {endpoint}: {e}")
         return []
 
+# --- CACHE ---
+# NGX figures only move a few times a day, so keep each endpoint's result for a
+# few minutes instead of calling the API on every page load and download.
+CACHE_TTL = 300  # seconds
+# A failed fetch is remembered briefly so an NGX outage costs one slow request
+# every FAILURE_TTL seconds rather than one per page load and download.
+FAILURE_TTL = 30  # seconds
+# endpoint -> (date, Future of (rows, fetched_at)). Keeping the Future rather
+# than the rows lets callers that arrive mid-fetch wait on it instead of
+# starting a duplicate request.
+_api_cache = {}
+_api_cache_lock = threading.Lock()
+
+def fetch_and_stamp(endpoint):
+    """Runs get_ngx_api_data(endpoint) and notes when it finished"""
+    return get_ngx_api_data(endpoint), time.monotonic()
+
+def get_api_future(endpoint):
+    """Returns a Future for today's endpoint data, sharing a fresh or in-flight fetch"""
+    today = datetime.date.today()
+    with _api_cache_lock:
+        cached = _api_cache.get(endpoint)
+        if cached and cached[0] == today:
+            future = cached[1]
+            if not future.done():
+                return future
+            data, fetched_at = future.result()
+            ttl = CACHE_TTL if data else FAILURE_TTL
+            if time.monotonic() - fetched_at < ttl:
+                return future
+
+        future = EXECUTOR.submit(fetch_and_stamp, endpoint)
+        _api_cache[endpoint] = (today, future)
+        return future
+
+def get_gainers_and_losers():
+    """Fetches the top and bottom symbol lists concurrently, from cache when fresh"""
+    futures = [get_api_future(endpoint) for endpoint in ["topsymbols", "bottomsymbols"]]
+    gainers, losers = (future.result()[0] for future in futures)
+    return gainers, losers
+
+def warm_up():
+    """Starts both fetches in the background so the first visitor hits a warm cache"""
+    for endpoint in ["topsymbols", "bottomsymbols"]:
+        get_api_future(endpoint)
+
+# --- REPORT HELPERS ---
+# Matches the bold, boxed, centred header row pandas used to write
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center'}
+
+def write_sheet(workbook, name, rows, header_format):
+    """Writes a list of row dicts to a new sheet, header first, top to bottom"""
+    sheet = workbook.add_worksheet(name)
+    if not rows:
+        return
+    columns = list(rows[0])
+    sheet.write_row(0, 0, columns, header_format)
+    for r, item in enumerate(rows, start=1):
+        sheet.write_row(r, 0, [item[c] for c in columns])
+
+# Tabs and line breaks become their own run elements, as python-docx does for cell.text
+RUN_SPECIALS = re.compile(r"(\t|\r|\n)")
+
+def word_run_xml(text):
+    """Returns the inner XML of a run holding text, matching python-docx's cell.text output"""
+    parts = []
+    for piece in RUN_SPECIALS.split(text):
+        if piece == "\t":
+            parts.append("<w:tab/>")
+        elif piece in ("\r", "\n"):
+            parts.append("<w:br/>")
+        elif piece:
+            # Word drops leading/trailing spaces unless told to keep them
+            space = ' xml:space="preserve"' if len(piece.strip()) < len(piece) else ""
+            parts.append(f"<w:t{space}>{escape(piece)}</w:t>")
+    return "".join(parts)
+
+def add_word_table(doc, header, rows):
+    """Appends a table to the document, built as one XML string and parsed once"""
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    from docx.shared import Emu
+
+    section = doc.sections[-1]
+    text_width = Emu(section.page_width - section.left_margin - section.right_margin)
+    col_w = text_width.twips // len(header)
+    grid = f'<w:gridCol w:w="{col_w}"/>' * len(header)
+    cell = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{col_w}"/></w:tcPr><w:p><w:r>{{}}</w:r></w:p></w:tc>'
+    body_rows = "".join(
+        "<w:tr>" + "".join(cell.format(word_run_xml(text)) for text in row) + "</w:tr>"
+        for row in [header, *rows]
+    )
+    tbl = parse_xml(
+        f'<w:tbl {nsdecls("w")}>'
+        '<w:tblPr><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+        f'<w:tblGrid>{grid}</w:tblGrid>'
+        f'{body_rows}</w:tbl>'
+    )
+    # Tables have to sit before the trailing section properties
+    doc.element.body.sectPr.addprevious(tbl)
+
+def build_excel_report(gainers, losers):
+    """Returns the xlsx report as bytes"""
+    import xlsxwriter  # imported on first download to keep app startup light
+
+    output = io.BytesIO()
+    
+    # Write rows straight to xlsxwriter; constant_memory flushes each row as it
+    # goes. (pandas' to_excel writes column by column, which this mode can't take.)
+    with xlsxwriter.Workbook(output, {'constant_memory': True}) as workbook:
+        header_format = workbook.add_format(HEADER_FORMAT)
+        write_sheet(workbook, 'Top Gainers', gainers, header_format)
+        write_sheet(workbook, 'Top Losers', losers, header_format)
+    return output.getvalue()
+
+def build_word_report(gainers, losers):
+    """Returns the docx report as bytes"""
+    from docx import Document  # imported on first download to keep app startup light
+
+    doc = Document()
+    doc.add_heading(f'NGX Market Report - {datetime.date.today()}', 0)
+    
+    for title, data in [("Top Gainers", gainers), ("Top Losers", losers)]:
+        doc.add_heading(title, level=1)
+        add_word_table(
+            doc,
+            ['Symbol', 'Price', '% Change'],
+            [(item['symbol'], item['close'], item['pc_chg']) for item in data]
+        )
+    
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+# Last file built by each builder, along with the data it was built from
+_report_cache = {}
+
+def get_report(builder, gainers, losers):
+    """Returns builder(gainers, losers), reusing the last file if the data hasn't changed"""
+    # The fetch layer hands back the same list objects until the data changes, so
+    # an identity check tells whether it is still current. The date is checked as
+    # well because a 304 can carry yesterday's lists (and heading) into today.
+    today = datetime.date.today()
+    cached = _report_cache.get(builder)
+    if cached and cached[0] == today and cached[1] is gainers and cached[2] is losers:
+        return cached[3]
+
+    report = builder(gainers, losers)
+    _report_cache[builder] = (today, gainers, losers, report)
+    return report
+
 # --- ROUTES ---
+# Day-of-month suffixes for the banner date, indexed by day (0 is unused)
+ORDINAL_SUFFIX = tuple(
+    "TH" if 11 <= day <= 13 else {1: "ST", 2: "ND", 3: "RD"}.get(day % 10, "TH")
+    for day in range(32)
+)
 
 @app.route('/')
 def home():
-    gainers = get_ngx_api_data("topsymbols")
-    losers = get_ngx_api_data("bottomsymbols")
-    today = datetime.date.today().strftime("%dTH %b %Y").upper()
-    return render_template('index.html', gainers=gainers, losers=losers, date=today)
+    gainers, losers = get_gainers_and_losers()
+    today = datetime.date.today()
+    banner_date = f"{today.day}{ORDINAL_SUFFIX[today.day]} {today.strftime('%b %Y').upper()}"
+    return render_template('index.html', gainers=gainers, losers=losers, date=banner_date)
 
 @app.route('/download/excel')
 def download_excel():
-    gainers = get_ngx_api_data("topsymbols")
-    losers = get_ngx_api_data("bottomsymbols")
-    
-    # Create in-memory buffer
-    output = io.BytesIO()
-    
-    # Use Pandas to write to Excel
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        pd.DataFrame(gainers).to_excel(writer, sheet_name='Top Gainers', index=False)
-        pd.DataFrame(losers).to_excel(writer, sheet_name='Top Losers', index=False)
-    
-    output.seek(0)
+    gainers, losers = get_gainers_and_losers()
+    output = io.BytesIO(get_report(build_excel_report, gainers, losers))
     return send_file(
         output,
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -73,30 +273,8 @@ def download_excel():
 
 @app.route('/download/word')
 def download_word():
-    gainers = get_ngx_api_data("topsymbols")
-    losers = get_ngx_api_data("bottomsymbols")
-    
-    doc = Document()
-    doc.add_heading(f'NGX Market Report - {datetime.date.today()}', 0)
-    
-    for title, data in [("Top Gainers", gainers), ("Top Losers", losers)]:
-        doc.add_heading(title, level=1)
-        table = doc.add_table(rows=1, cols=3)
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Symbol'
-        hdr_cells[1].text = 'Price'
-        hdr_cells[2].text = '% Change'
-        
-        for item in data:
-            row_cells = table.add_row().cells
-            row_cells[0].text = item['symbol']
-            row_cells[1].text = item['close']
-            row_cells[2].text = item['pc_chg']
-    
-    output = io.BytesIO()
-    doc.save(output)
-    output.seek(0)
-    
+    gainers, losers = get_gainers_and_losers()
+    output = io.BytesIO(get_report(build_word_report, gainers, losers))
     return send_file(
         output,
         mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -105,5 +283,14 @@ def download_word():
     )
 
 if __name__ == '__main__':
+    # Debug mode (reloader + debugger) is opt-in: FLASK_DEBUG=1 python app.py
+    # Read it the way Flask does, after loading .env/.flaskenv, since app.run
+    # won't look at FLASK_DEBUG itself once debug is passed explicitly.
+    load_dotenv()
+    debug = get_debug_flag()
+    # The reloader's parent process only watches files; warm up in the one that serves.
+    # (Under gunicorn, gunicorn.conf.py warms up each worker instead.)
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up()
     # host='0.0.0.0' allows colleagues on the same Wi-Fi to access via your IP
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    app.run(host='0.0.0.0', port=8080, debug=debug)
@@ -0,0 +1,7 @@
+# Picked up automatically by `gunicorn app:app` when run from this directory.
+
+def post_fork(server, worker):
+    # Warm each worker's NGX cache after the fork, so executor threads are never
+    # started in the master process (which would break under --preload).
+    from app import warm_up
+    warm_up()